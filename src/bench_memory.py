@@ -0,0 +1,154 @@
+# Compare the peak memory of DOM and streaming page parsing
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import importlib
+import importlib.util
+import multiprocessing
+import resource
+import statistics
+import sys
+
+import stream_parse
+
+
+extractors = {
+    'ranking': stream_parse.RankingExtractor,
+    'roster': stream_parse.RosterExtractor,
+}
+
+
+# parse the page the way the scrapers used to: read the whole response and
+# build a BeautifulSoup DOM of it
+def parse_dom(page, kind):
+    from bs4 import BeautifulSoup
+
+    with open(page, 'rb') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+
+    if kind == 'ranking':
+        return len(soup.select('div.ranked-team.standard-box'))
+
+    return len(soup.find(class_='bodyshot-team').find_all('a', href=True))
+
+
+def parse_stream(page, kind):
+    with open(page, 'rb') as f:
+        return sum(1 for _ in stream_parse.stream_records(f, extractors[kind]()))
+
+
+# peak resident set size of this process in KiB
+def max_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports KiB, macOS reports bytes
+    if sys.platform == 'darwin':
+        rss //= 1024
+
+    return rss
+
+
+def worker(mode, page, kind, repeat, results):
+    # load bs4 up front so its import is not counted as parsing memory
+    if mode == 'dom':
+        importlib.import_module('bs4')
+
+    start_rss = max_rss()
+
+    parse = parse_dom if mode == 'dom' else parse_stream
+    records = 0
+    for i in range(repeat):
+        records = parse(page, kind)
+
+    results.put((start_rss, max_rss(), records))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='measure the peak RSS per worker of parsing a saved page'
+    )
+    parser.add_argument('page', help='html file saved from HLTV')
+    parser.add_argument(
+        '--kind',
+        help='type of page that was saved',
+        choices=sorted(extractors),
+        default='ranking'
+    )
+    parser.add_argument(
+        '--mode',
+        help='parsers to measure, dom needs bs4 installed',
+        choices=['dom', 'stream', 'both'],
+        default='both'
+    )
+    parser.add_argument(
+        '--workers',
+        help='number of worker processes',
+        type=int,
+        default=multiprocessing.cpu_count()
+    )
+    parser.add_argument(
+        '--repeat',
+        help='times each worker parses the page',
+        type=int,
+        default=10
+    )
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.repeat < 1:
+        parser.error('--workers and --repeat must be at least 1')
+
+    modes = ['dom', 'stream'] if args.mode == 'both' else [args.mode]
+
+    if 'dom' in modes and importlib.util.find_spec('bs4') is None:
+        parser.error('bs4 must be installed to measure the dom parser')
+
+    # spawn gives every worker a fresh interpreter so its peak RSS is not
+    # inherited from this process
+    ctx = multiprocessing.get_context('spawn')
+
+    print('%-8s %6s %8s %12s %12s %12s' %
+          ('mode', 'worker', 'records', 'start KiB', 'peak KiB', 'parse KiB'))
+
+    for mode in modes:
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=worker,
+                        args=(mode, args.page, args.kind, args.repeat, results))
+            for i in range(args.workers)
+        ]
+
+        for w in workers:
+            w.start()
+
+        rows = [results.get() for w in workers]
+
+        for w in workers:
+            w.join()
+
+        # each row is a single worker, so peak - start is the memory that
+        # worker needed for parsing
+        for i, (start, peak, records) in enumerate(rows):
+            print('%-8s %6d %8d %12d %12d %12d' %
+                  (mode, i, records, start, peak, peak - start))
+
+        parse_rss = [peak - start for start, peak, _ in rows]
+        print('%-8s parse KiB per worker: min %d, median %d, max %d' %
+              (mode, min(parse_rss), statistics.median(parse_rss),
+               max(parse_rss)))
+
+
+if __name__ == '__main__':
+    main()
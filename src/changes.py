@@ -0,0 +1,231 @@
+# Append-only log of changes to the HLTV rankings
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# every change gets the next seq from the rank_changes table; consumers keep
+# the last seq they read and poll for anything after it
+#
+# kinds of changes, with what is stored in data:
+#   week_published  a new ranking: teams, previous (date of the last ranking)
+#   week_revised    a ranking, or the one before it, was stored after it was
+#                   published: teams, previous; the changes that follow
+#                   replace every earlier change on that date
+#   team_entered    team is in this ranking but not the last: rank, points
+#   team_left       team was in the last ranking but not this: rank, points
+#   rank_changed    rank or points moved: rank, previous_rank, rank_delta,
+#                   points, previous_points, points_delta; a positive
+#                   rank_delta means the team climbed
+#   name_changed    name of a team id changed: hltv_id, previous_name
+#   color_changed   color of a team changed: hltv_id, color, previous_color
+
+import sys
+import json
+import bisect
+
+import common
+
+# kinds that start the changes of a week
+week_kinds = ('week_published', 'week_revised')
+
+
+def create_tables(cur):
+    cur.execute('SELECT to_regclass(%s)', ('public.rank_changes',))
+    if cur.fetchone() != ('rank_changes',):
+        cur.execute(
+            'CREATE TABLE rank_changes (\
+                seq bigserial PRIMARY KEY,\
+                created timestamptz DEFAULT now(),\
+                kind varchar,\
+                date date,\
+                team varchar,\
+                data jsonb\
+            )'
+        )
+
+
+# only one transaction writes changes at a time so that they commit in seq
+# order and a consumer never skips a seq that commits after a higher one
+def lock(cur):
+    cur.execute('LOCK TABLE public.rank_changes IN EXCLUSIVE MODE')
+
+
+def emit(cur, kind, date, team, data):
+    lock(cur)
+    cur.execute(
+        'INSERT INTO public.rank_changes (kind, date, team, data) \
+            VALUES (%s, %s, %s, %s)',
+        (kind, date, team, json.dumps(data))
+    )
+
+
+# compare a team about to be upserted with the stored row
+def record_team(cur, hltv_id, team, color):
+    cur.execute('SELECT team, color FROM teams WHERE hltv_id=(%s)', (hltv_id,))
+    row = cur.fetchone()
+    if row is None:
+        return
+
+    previous_name, previous_color = row
+
+    if previous_name != team:
+        emit(cur, 'name_changed', None, team, {
+            'hltv_id': hltv_id,
+            'previous_name': previous_name,
+        })
+
+    if previous_color != color:
+        emit(cur, 'color_changed', None, team, {
+            'hltv_id': hltv_id,
+            'color': color,
+            'previous_color': previous_color,
+        })
+
+
+# {team: (rank, points)} of the ranking on date
+def get_ranking(cur, date):
+    cur.execute('SELECT team, rank, points FROM ranks WHERE date=(%s)', (date,))
+    return {team: (rank, points) for team, rank, points in cur.fetchall()}
+
+
+# emit the changes of the rankings on dates, which were just inserted or
+# corrected, and of the rankings after them, whose previous week changed
+#
+# a week that was published before is published again as week_revised; a
+# consumer replaces the changes it has for that week with the ones that follow
+def publish_weeks(cur, dates):
+    lock(cur)
+
+    cur.execute('SELECT DISTINCT date FROM ranks ORDER BY date')
+    stored = [date for date, in cur.fetchall()]
+
+    cur.execute(
+        'SELECT 1 FROM rank_changes WHERE kind IN %s LIMIT 1', (week_kinds,)
+    )
+
+    # the first run on an existing database publishes every stored ranking
+    if cur.fetchone() is None:
+        dates = stored
+
+    weeks = set()
+    for date in dates:
+        index = bisect.bisect_left(stored, date)
+        weeks.update(stored[index:index + 2])
+
+    if not weeks:
+        return
+
+    cur.execute(
+        'SELECT DISTINCT date FROM rank_changes \
+            WHERE kind IN %s AND date IN %s',
+        (week_kinds, tuple(weeks))
+    )
+    published = {date for date, in cur.fetchall()}
+
+    for date in sorted(weeks):
+        index = bisect.bisect_left(stored, date)
+        previous_date = stored[index - 1] if index > 0 else None
+
+        current = get_ranking(cur, date)
+        previous = get_ranking(cur, previous_date) if previous_date else dict()
+
+        kind = 'week_revised' if date in published else 'week_published'
+        emit(cur, kind, date, None, {
+            'teams': len(current),
+            'previous': previous_date.isoformat() if previous_date else None,
+        })
+
+        for team in sorted(current, key=lambda t: current[t][0]):
+            rank, points = current[team]
+
+            if team not in previous:
+                emit(cur, 'team_entered', date, team, {
+                    'rank': rank,
+                    'points': points,
+                })
+                continue
+
+            previous_rank, previous_points = previous[team]
+            if (rank, points) != (previous_rank, previous_points):
+                emit(cur, 'rank_changed', date, team, {
+                    'rank': rank,
+                    'previous_rank': previous_rank,
+                    'rank_delta': previous_rank - rank,
+                    'points': points,
+                    'previous_points': previous_points,
+                    'points_delta': points - previous_points,
+                })
+
+        for team in sorted(previous, key=lambda t: previous[t][0]):
+            if team not in current:
+                rank, points = previous[team]
+                emit(cur, 'team_left', date, team, {
+                    'rank': rank,
+                    'points': points,
+                })
+
+
+def last_seq(cur):
+    cur.execute('SELECT COALESCE(MAX(seq), 0) FROM rank_changes')
+    return cur.fetchone()[0]
+
+
+# write every change after seq to f as newline delimited json
+#
+# returns the seq of the last change written, to poll from next time
+def write_ndjson(cur, f, since):
+    cur.execute(
+        'SELECT seq, created, kind, date, team, data FROM rank_changes \
+            WHERE seq > %s ORDER BY seq',
+        (since,)
+    )
+
+    for seq, created, kind, date, team, data in cur.fetchall():
+        f.write(json.dumps({
+            'seq': seq,
+            'created': created.isoformat(),
+            'kind': kind,
+            'date': date.isoformat() if date is not None else None,
+            'team': team,
+            'data': data,
+        }) + '\n')
+        since = seq
+
+    return since
+
+
+# append the changes of this run to path, if one was given
+def append_ndjson(cur, path, since):
+    if path is None:
+        return
+
+    with open(path, 'a') as f:
+        write_ndjson(cur, f, since)
+
+
+def run(args):
+    conn = common.connect_to_db(args)
+
+    cur = conn.cursor()
+
+    create_tables(cur)
+    conn.commit()
+
+    if args.output is None:
+        write_ndjson(cur, sys.stdout, args.since)
+    else:
+        append_ndjson(cur, args.output, args.since)
+
+    cur.close()
+    conn.close()
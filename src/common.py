@@ -16,17 +16,28 @@
 
 import os
 import getpass
-
-import psycopg2
+import threading
+import traceback
+import multiprocessing
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
 
 def connect_to_db(args):
+    # imported here so the CLI can start without loading the database driver
+    import psycopg2
+
+    dsn = 'dbname=%s user=%s' % (args.dbname, args.role,)
+
+    # connect to a database on another host, e.g. from a distributed worker
+    if getattr(args, 'host', None) is not None:
+        dsn += ' host=%s' % (args.host,)
+    if getattr(args, 'port', None) is not None:
+        dsn += ' port=%s' % (args.port,)
+
     # try without supplying password
     try:
-        conn = psycopg2.connect('dbname=%s user=%s' %
-                                (args.dbname, args.role,))
+        conn = psycopg2.connect(dsn)
         return conn
     except psycopg2.OperationalError as e:
         if 'no password supplied' not in str(e):
@@ -34,9 +45,50 @@ def connect_to_db(args):
 
     # try again asking for password
     try:
-        conn = psycopg2.connect('dbname=%s user=%s password=%s' %
-                                (args.dbname, args.role,
-                                 getpass.getpass(prompt='DB Password: ')))
+        conn = psycopg2.connect('%s password=%s' %
+                                (dsn, getpass.getpass(prompt='DB Password: ')))
         return conn
     except (NameError, psycopg2.OperationalError):
         raise
+
+
+# call handler on every item of work_queue using one thread per cpu
+#
+# handler may put more items on work_queue while it runs; the pool only
+# returns once every item, including those added later, has been processed
+def run_thread_pool(work_queue, handler):
+    def thread_work():
+        while True:
+            item = work_queue.get()
+
+            if item is None:
+                break
+
+            # one bad page must not stop the pool, join() waits for every
+            # item to be marked done
+            try:
+                handler(item)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                work_queue.task_done()
+
+    num_threads = multiprocessing.cpu_count()
+    threads = []
+
+    # launch threads
+    for i in range(num_threads):
+        thread = threading.Thread(target=thread_work)
+        thread.start()
+        threads.append(thread)
+
+    # wait for all the items to be processed
+    work_queue.join()
+
+    # tell threads to exit
+    for i in range(num_threads):
+        work_queue.put(None)
+
+    # wait for threads to finish
+    for t in threads:
+        t.join()
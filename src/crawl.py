@@ -0,0 +1,99 @@
+# Scrape the HLTV world rankings and team rosters in a single run
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import queue
+import sys
+
+import common
+import changes
+import scrape_teams
+import scrape_players
+
+
+# ranking dates and team pages share one queue; a LIFO queue makes the
+# threads pick up team pages as soon as they are discovered instead of after
+# every remaining date, so the roster fetches overlap with the ranking backfill
+work_queue = queue.LifoQueue()
+
+seen_teams = set()
+seen_teams_lock = threading.Lock()
+
+
+# queue the team page of a team the first time its hltv id is seen
+def enqueue_team(team):
+    seen_teams_lock.acquire()
+    is_new = team[0] not in seen_teams
+    seen_teams.add(team[0])
+    seen_teams_lock.release()
+
+    if is_new:
+        work_queue.put(('team', team))
+
+
+def thread_work(item):
+    kind, value = item
+
+    if kind == 'date':
+        ranked_teams = scrape_teams.get_page_teams(value)
+        for team in scrape_teams.process_page(value, ranked_teams):
+            enqueue_team(team)
+    else:
+        scrape_players.thread_work(value)
+
+
+def run(args):
+    conn = common.connect_to_db(args)
+
+    cur = conn.cursor()
+
+    scrape_teams.create_tables(cur)
+    scrape_players.create_tables(cur)
+    conn.commit()
+
+    for date in scrape_teams.get_dates(cur, args.update_all):
+        work_queue.put(('date', date))
+
+    # rosters of teams that are already in the database but may not show up
+    # in any of the rankings scraped during this run
+    cur.execute('SELECT hltv_id, team FROM teams')
+    for team in cur.fetchall():
+        enqueue_team(team)
+
+    common.run_thread_pool(work_queue, thread_work)
+
+    scrape_teams.add_team_colors()
+
+    # no other run can add changes until this one commits, so the changes
+    # after since are those of this run
+    changes.lock(cur)
+    since = changes.last_seq(cur)
+
+    changed_dates = scrape_teams.insert_data(cur, scrape_teams.teams,
+                                             args.force_update)
+    scrape_players.insert_data(cur, scrape_players.players, args.force_update)
+    changes.publish_weeks(cur, changed_dates)
+
+    conn.commit()
+
+    changes.append_ndjson(cur, args.changes_ndjson, since)
+    cur.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    import hltv_stats
+    hltv_stats.main(['crawl'] + sys.argv[1:])
@@ -0,0 +1,179 @@
+# Split a scrape across worker processes on any number of hosts
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+import time
+import socket
+import datetime
+import traceback
+
+import common
+import changes
+import work_queue
+import scrape_teams
+import scrape_players
+
+
+# ranking page for the date in key
+def process_date(cur, key, force_update):
+    date = datetime.date.fromisoformat(key)
+
+    ranked_teams = list(scrape_teams.get_page_teams(date))
+
+    # a ranking that is not published yet, or a failed fetch, gives no
+    # teams; the item is tried again instead of being done with no ranks
+    if not ranked_teams:
+        raise RuntimeError('no teams in the ranking of %s' % (key,))
+
+    changed = False
+    for team in ranked_teams:
+        if scrape_teams.insert_rank(cur, date, team['name'], team['rank'],
+                                    team['points'], force_update):
+            changed = True
+
+    # the changes lock is taken before any team item is locked below, as
+    # team items take it when they record a change, so the two cannot
+    # deadlock
+    if changed:
+        changes.publish_weeks(cur, [date])
+
+    # queued in id order so that concurrent dates lock team items in the same
+    # order and cannot deadlock
+    for team in sorted(ranked_teams, key=lambda t: int(t['href'].split('/')[2])):
+        hltv_id = team['href'].split('/')[2]
+        payload = json.dumps({
+            'name': team['name'],
+            'logo_url': team['logo_url'],
+            'date': key,
+        })
+
+        # the newest ranking decides the name and logo of a team; teams
+        # queued from the database have neither a date nor a logo, so the
+        # first ranking they appear in lets their color be refreshed
+        work_queue.enqueue_newer(cur, 'team', hltv_id, payload, 'date', key)
+
+
+# color and roster of the team with the hltv id in key
+def process_team(cur, key, payload, force_update):
+    hltv_id = int(key)
+    payload = json.loads(payload)
+    name = payload['name']
+
+    # everything is fetched before the first write, so that a change to the
+    # team, which locks the changes table, is not held during network I/O
+
+    # teams queued from the database have no logo, their color is kept
+    color = None
+    if payload.get('logo_url') is not None:
+        print('Getting color for %s' % (name))
+        color = scrape_teams.dominant_color_url(payload['logo_url'])
+
+    team_players = list(scrape_players.get_team_players((hltv_id, name)))
+
+    if color is not None:
+        scrape_teams.insert_team(cur, hltv_id, name, color, force_update)
+
+    for player in team_players:
+        player_id = player['href'].split('/')[2]
+        scrape_players.insert_player(cur, player_id, player['name'], name,
+                                     force_update)
+
+
+def create_tables(cur):
+    scrape_teams.create_tables(cur)
+    scrape_players.create_tables(cur)
+    work_queue.create_tables(cur)
+
+
+# queue the rankings that still need to be scraped and every known team
+def run_enqueue(args):
+    conn = common.connect_to_db(args)
+
+    cur = conn.cursor()
+
+    create_tables(cur)
+
+    # every date after the newest stored ranking is queued again, even if
+    # it failed too often before, as scrape-teams would fetch it again; a
+    # done date always has ranks, so it is only run again with --update-all
+    dates = scrape_teams.get_dates(cur, args.update_all)
+    for date in dates:
+        work_queue.enqueue(cur, 'date', date.isoformat(), reset=True)
+
+    # rosters are refreshed on every run, as scrape-players does
+    cur.execute('SELECT hltv_id, team FROM teams')
+    teams = cur.fetchall()
+    for hltv_id, name in teams:
+        work_queue.enqueue(cur, 'team', str(hltv_id),
+                           json.dumps({'name': name}), reset=True)
+
+    conn.commit()
+
+    print('Queued %d dates and %d teams' % (len(dates), len(teams)))
+
+    cur.close()
+    conn.close()
+
+
+# lease and process items until the queue is empty
+def run_work(args):
+    worker = '%s:%d' % (socket.gethostname(), os.getpid())
+
+    conn = common.connect_to_db(args)
+
+    # the tables are created by enqueue so that workers started together do
+    # not race to create them
+    cur = conn.cursor()
+
+    while True:
+        item = work_queue.lease(cur, worker, args.lease_seconds)
+        conn.commit()
+
+        if item is None:
+            # wait for items leased by other workers, which may queue teams
+            # or be leased again if their worker died
+            if work_queue.remaining(cur) == 0:
+                break
+
+            conn.commit()
+            time.sleep(args.poll_seconds)
+            continue
+
+        kind, key, payload = item
+        print('%s processing %s %s' % (worker, kind, key))
+
+        # results and completion are committed together, and every insert
+        # is an upsert, so an item processed twice after an expired lease
+        # leaves the database as if it was processed once
+        try:
+            if kind == 'date':
+                process_date(cur, key, args.force_update)
+            else:
+                process_team(cur, key, payload, args.force_update)
+
+            if work_queue.complete(cur, kind, key, worker):
+                conn.commit()
+            else:
+                conn.rollback()
+                print('%s lost the lease on %s %s' % (worker, kind, key))
+        except Exception:
+            # the item is leased again once its lease expires
+            conn.rollback()
+            traceback.print_exc()
+
+    cur.close()
+    conn.close()
@@ -0,0 +1,63 @@
+# Export the HLTV tables as csv files
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import common
+
+
+# globals
+export_path = common.ROOT_DIR + '/export/'
+
+tables = ['ranks', 'teams', 'players']
+
+
+# write each existing table to <output>/<table>.csv
+def export_tables(cur, output):
+    for table in tables:
+        cur.execute('SELECT to_regclass(%s)', ('public.' + table,))
+        if cur.fetchone() != (table,):
+            continue
+
+        filepath = os.path.join(output, table + '.csv')
+        print('Exporting %s to %s' % (table, filepath))
+
+        with open(filepath, 'w') as f:
+            cur.copy_expert(
+                'COPY public.%s TO STDOUT WITH CSV HEADER' % (table,), f
+            )
+
+
+def run(args):
+    output = args.output or export_path
+
+    conn = common.connect_to_db(args)
+
+    cur = conn.cursor()
+
+    if not os.path.exists(output):
+        os.makedirs(output)
+
+    export_tables(cur, output)
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    import hltv_stats
+    hltv_stats.main(['export'] + sys.argv[1:])
@@ -0,0 +1,222 @@
+# Command line entry point for the HLTV scraper and plotter
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+
+# only lightweight modules are imported at the top of this file; each
+# subcommand imports its own subsystem (psycopg2, plotly) when it runs so
+# that --help and short invocations stay fast
+
+
+def scrape_teams(args):
+    import scrape_teams
+    scrape_teams.run(args)
+
+
+def scrape_players(args):
+    import scrape_players
+    scrape_players.run(args)
+
+
+def crawl(args):
+    import crawl
+    crawl.run(args)
+
+
+def enqueue(args):
+    import distributed
+    distributed.run_enqueue(args)
+
+
+def work(args):
+    import distributed
+    distributed.run_work(args)
+
+
+def changes(args):
+    import changes
+    changes.run(args)
+
+
+def plot(args):
+    import plot_ranks
+    plot_ranks.run(args)
+
+
+def export(args):
+    import export
+    export.run(args)
+
+
+def add_update_arguments(parser):
+    parser.add_argument(
+        '--update-all',
+        help='do not try to skip data that is already in the database',
+        action='store_true',
+        default=False
+    )
+
+    parser.add_argument(
+        '--force-update',
+        help='use scraped data for any conflicts in database',
+        action='store_true',
+        default=False
+    )
+
+
+def add_changes_arguments(parser):
+    parser.add_argument(
+        '--changes-ndjson',
+        help='append the ranking changes of this run to this ndjson file',
+        default=None
+    )
+
+
+def build_parser():
+    # arguments shared by every subcommand
+    db_parser = argparse.ArgumentParser(add_help=False)
+    db_parser.add_argument('--dbname', help='name of the database to connect to')
+    db_parser.add_argument('--role', help='role to access this database with')
+    db_parser.add_argument('--host', help='host of the database server')
+    db_parser.add_argument('--port', help='port of the database server')
+
+    parser = argparse.ArgumentParser(prog='hltv_stats')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    sub = subparsers.add_parser(
+        'scrape-teams',
+        parents=[db_parser],
+        help='scrape the HLTV world rankings into the database'
+    )
+    add_update_arguments(sub)
+    add_changes_arguments(sub)
+    sub.set_defaults(func=scrape_teams)
+
+    sub = subparsers.add_parser(
+        'scrape-players',
+        parents=[db_parser],
+        help='scrape the rosters of every team in the database'
+    )
+    add_update_arguments(sub)
+    sub.set_defaults(func=scrape_players)
+
+    sub = subparsers.add_parser(
+        'crawl',
+        parents=[db_parser],
+        help='scrape the rankings and the rosters of every team in one run'
+    )
+    add_update_arguments(sub)
+    add_changes_arguments(sub)
+    sub.set_defaults(func=crawl)
+
+    sub = subparsers.add_parser(
+        'enqueue',
+        parents=[db_parser],
+        help='queue a scrape in the database for distributed workers'
+    )
+    sub.add_argument(
+        '--update-all',
+        help='do not try to skip data that is already in the database',
+        action='store_true',
+        default=False
+    )
+    sub.set_defaults(func=enqueue)
+
+    sub = subparsers.add_parser(
+        'work',
+        parents=[db_parser],
+        help='process queued scrape items until the queue is empty'
+    )
+    sub.add_argument(
+        '--force-update',
+        help='use scraped data for any conflicts in database',
+        action='store_true',
+        default=False
+    )
+    sub.add_argument(
+        '--lease-seconds',
+        help='seconds before an unfinished item is given to another worker',
+        type=int,
+        default=300
+    )
+    sub.add_argument(
+        '--poll-seconds',
+        help='seconds to wait when every remaining item is leased',
+        type=float,
+        default=5
+    )
+    sub.set_defaults(func=work)
+
+    sub = subparsers.add_parser(
+        'changes',
+        parents=[db_parser],
+        help='print the ranking changes after a sequence number as ndjson'
+    )
+    sub.add_argument(
+        '--since',
+        help='sequence number of the last change already read',
+        type=int,
+        default=0
+    )
+    sub.add_argument(
+        '--output',
+        help='append to this file instead of printing',
+        default=None
+    )
+    sub.set_defaults(func=changes)
+
+    sub = subparsers.add_parser(
+        'plot',
+        parents=[db_parser],
+        help='plot the rankings stored in the database'
+    )
+    sub.add_argument(
+        '--by_points',
+        help='create a plot using the HLTV points',
+        action='store_true',
+        default=False
+    )
+    sub.add_argument(
+        '--by_rank',
+        help='create a plot using the HLTV rank',
+        action='store_true',
+        default=False
+    )
+    sub.set_defaults(func=plot)
+
+    sub = subparsers.add_parser(
+        'export',
+        parents=[db_parser],
+        help='export the database tables as csv files'
+    )
+    sub.add_argument(
+        '--output',
+        help='directory to write the csv files to',
+        default=None
+    )
+    sub.set_defaults(func=export)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,7 +15,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
-import argparse
+import sys
 import collections
 
 import plotly as py
@@ -25,13 +25,11 @@ import common
 
 
 # globals
-args = []
-
 plot_path = common.ROOT_DIR + '/plots/'
 
 
 # make plotly html files from the rankings
-def plot_teams(cur):
+def plot_teams(cur, by_rank, by_points):
     # get list of all unique dates
     cur.execute('SELECT DISTINCT date FROM ranks ORDER BY date')
     all_dates = [date for date, in cur.fetchall()]
@@ -64,7 +62,7 @@ def plot_teams(cur):
         #
         # the OrderedDict is important for making sure the x and y values in
         # the plot are ordered by date
-        if args.by_rank:
+        if by_rank:
             ranks = {date: rank for date, _, rank, _ in records}
 
             first_date = min(ranks)
@@ -91,7 +89,7 @@ def plot_teams(cur):
 
             data_ranks.append(team_plot)
 
-        if args.by_points:
+        if by_points:
             points = {date: point for date, _, _, point in records}
 
             for date in all_dates:
@@ -115,7 +113,7 @@ def plot_teams(cur):
 
             data_points.append(team_plot)
 
-    if args.by_rank:
+    if by_rank:
         # manually sets the range so rank 1 is at the top
         # ticks start at 1 and go by 5s
         layout = go.Layout(
@@ -129,42 +127,20 @@ def plot_teams(cur):
         fig = go.Figure(data=data_ranks, layout=layout)
         plot(fig, filename=plot_path + 'ranks.html')
 
-    if args.by_points:
+    if by_points:
         layout = go.Layout()
 
         fig = go.Figure(data=data_points, layout=layout)
         plot(fig, filename=plot_path + 'points.html')
 
 
-def parse_arguments():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--dbname', help='name of the database to connect to')
-    parser.add_argument('--role', help='role to access this database with')
-
-    parser.add_argument(
-        '--by_points',
-        help='create a plot using the HLTV points',
-        action='store_true',
-        default=False
-    )
-
-    parser.add_argument(
-        '--by_rank',
-        help='create a plot using the HLTV rank',
-        action='store_true',
-        default=False
-    )
-
-    global args
-    args = parser.parse_args()
-
-
-def main():
-    parse_arguments()
+def run(args):
+    by_rank = args.by_rank
+    by_points = args.by_points
 
     # if neither plot by points or rank is set, only set plot by rank
-    if not args.by_rank and not args.by_points:
-        args.by_rank = True
+    if not by_rank and not by_points:
+        by_rank = True
 
     conn = common.connect_to_db(args)
 
@@ -173,11 +149,12 @@ def main():
     if not os.path.exists(plot_path):
         os.mkdir(plot_path)
 
-    plot_teams(cur)
+    plot_teams(cur, by_rank, by_points)
 
     cur.close()
     conn.close()
 
 
 if __name__ == '__main__':
-    main()
+    import hltv_stats
+    hltv_stats.main(['plot'] + sys.argv[1:])
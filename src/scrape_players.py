@@ -15,75 +15,46 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import threading
-import multiprocessing
-import subprocess
 import queue
-import argparse
+import sys
 
-from bs4 import BeautifulSoup
-import psycopg2
 import common
+import stream_parse
 
 
 players = dict()
 players_lock = threading.Lock()
 
-teams_queue = queue.Queue()
 
-args = []
+def thread_work(team):
+    process_players_page(get_team_players(team), team[1])
 
 
-def thread_work():
-    while True:
-        team = teams_queue.get()
-
-        if team is None:
-            break
-
-        team_soup = get_page_soup(team)
-        players_soup = process_team_page(team_soup)
-        process_players_page(players_soup, team[1])
-
-        teams_queue.task_done()
-
-
-def process_players_page(soup, team):
-    players_lock.acquire()
-    for player in soup:
-        name = player['title']
+def process_players_page(team_players, team):
+    for player in team_players:
+        name = player['name']
         href = player['href']
         hltv_id = href.split('/')[2]
 
         print('Processing data for %s' % (name))
 
+        players_lock.acquire()
         if name not in players:
             players[name] = dict()
             players[name]['hltv_id'] = hltv_id
             players[name]['team'] = team
-    players_lock.release()
-
+        players_lock.release()
 
-def process_team_page(soup):
-    team_links = soup.find(class_='bodyshot-team')
-    players = team_links.findAll('a', href=True)
 
-    return players
-
-
-def get_page_soup(team):
+# stream the team page, yielding each player as soon as it has been parsed
+def get_team_players(team):
     print('Getting data for %s' % (team[1]))
 
     url = 'https://www.hltv.org/team/' + str(team[0]) + '/' +\
         str(team[1].replace(' ', '-').replace('?', '-'))
     print(url)
-    p = subprocess.run(['curl', url],
-                       stdout=subprocess.PIPE,
-                       stderr=subprocess.DEVNULL)
-
-    page = p.stdout
-    soup = BeautifulSoup(page, 'html.parser')
 
-    return soup
+    return stream_parse.stream_url(url, stream_parse.RosterExtractor())
 
 
 def create_tables(cur):
@@ -98,52 +69,31 @@ def create_tables(cur):
         )
 
 
-def insert_data(cur, players):
+def insert_player(cur, hltv_id, name, team, force_update):
+    if force_update:
+        cur.execute(
+            'INSERT INTO public.players VALUES (%s, %s, %s) \
+                ON CONFLICT (hltv_id) DO UPDATE \
+                SET hltv_id = excluded.hltv_id,\
+                    name = excluded.name,\
+                    team = excluded.team',
+            (hltv_id, name, team)
+        )
+    else:
+        cur.execute(
+            'INSERT INTO public.players VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
+            (hltv_id, name, team)
+        )
+
+
+def insert_data(cur, players, force_update):
     for player in players:
         row = players[player]
 
-        if args.force_update:
-            cur.execute(
-                'INSERT INTO public.players VALUES (%s, %s, %s) \
-                    ON CONFLICT (hltv_id) DO UPDATE \
-                    SET hltv_id = excluded.hltv_id,\
-                        name = excluded.name,\
-                        team = excluded.team',
-                (row['hltv_id'], player, row['team'])
-            )
-        else:
-            cur.execute(
-                'INSERT INTO public.players VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
-                (row['hltv_id'], player, row['team'])
-            )
-
-
-def parse_arguments():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--dbname', help='name of the database to connect to')
-    parser.add_argument('--role', help='role to access this database with')
-
-    parser.add_argument(
-        '--update-all',
-        help='do not try to skip data that is already in the database',
-        action='store_true',
-        default=False
-    )
-
-    parser.add_argument(
-        '--force-update',
-        help='use scraped data for any conflicts in database',
-        action='store_true',
-        default=False
-    )
-
-    global args
-    args = parser.parse_args()
-
-
-def main():
-    parse_arguments()
+        insert_player(cur, row['hltv_id'], player, row['team'], force_update)
+
 
+def run(args):
     conn = common.connect_to_db(args)
 
     cur = conn.cursor()
@@ -154,34 +104,20 @@ def main():
     cur.execute('SELECT * FROM teams')
     teams = cur.fetchall()
 
+    teams_queue = queue.Queue()
+
     for team in teams:
         teams_queue.put(team)
 
-    num_threads = multiprocessing.cpu_count()
-    threads = []
+    common.run_thread_pool(teams_queue, thread_work)
 
-    # launch threads
-    for i in range(num_threads):
-        thread = threading.Thread(target=thread_work)
-        thread.start()
-        threads.append(thread)
-
-    # wait for all the dates to be processed
-    teams_queue.join()
-
-    # tell threads to exit
-    for i in range(num_threads):
-        teams_queue.put(None)
-
-    # wait for threads to finish
-    for t in threads:
-        t.join()
-
-    insert_data(cur, players)
+    insert_data(cur, players, args.force_update)
 
     conn.commit()
     cur.close()
     conn.close()
 
+
 if __name__ == '__main__':
-    main()
+    import hltv_stats
+    hltv_stats.main(['scrape-players'] + sys.argv[1:])
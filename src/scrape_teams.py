@@ -17,31 +17,27 @@
 import os
 import shutil
 import threading
-import multiprocessing
 import subprocess
 import queue
 import datetime
-import argparse
 import math
+import sys
+import tempfile
 
-from bs4 import BeautifulSoup
 import common
+import changes
+import stream_parse
 
 
 # globals
 logos_path = common.ROOT_DIR + '/logos/'
 
 base_url = 'https://www.hltv.org/ranking/teams/'
-dates = []
 
 teams = dict()
 team_colors = dict()
 teams_lock = threading.Lock()
 
-dates_queue = queue.Queue()
-
-args = None
-
 # human readable mapping from aligned dates to actual dates in hltv
 dates_map = {
     '2015-09-28': '2015-10-01',
@@ -72,17 +68,8 @@ fix_dates = {
 }
 
 
-def thread_work():
-    while True:
-        date = dates_queue.get()
-
-        if date is None:
-            break
-
-        soup = get_page_soup(date)
-        process_page(date, soup)
-
-        dates_queue.task_done()
+def thread_work(date):
+    process_page(date, get_page_teams(date))
 
 
 def dominant_color_url(url):
@@ -91,7 +78,9 @@ def dominant_color_url(url):
     if not os.path.exists(logos_path):
         os.makedirs(logos_path)
 
-    filepath = logos_path + 'temp.svg'
+    # unique per call so that several workers can share the logos folder
+    fd, filepath = tempfile.mkstemp(suffix='.svg', dir=logos_path)
+    os.close(fd)
 
     subprocess.run(['wget', url, '-O', filepath],
                    stdout=subprocess.DEVNULL,
@@ -104,6 +93,8 @@ def dominant_color_url(url):
         stdout=subprocess.PIPE,
         stderr=subprocess.DEVNULL)
 
+    os.remove(filepath)
+
     colors = []
 
     for line in info.stdout.split(b'\n'):
@@ -139,51 +130,42 @@ def dominant_color_url(url):
     return '#' + hex_colors[index_max]
 
 
-# parse page for team name, rank, and points
-def process_page(date, soup):
-    teams_div = soup.select('div.ranked-team.standard-box')
-
-    for team in teams_div:
-        name = team.find(class_='name').text
-        rank = int(team.find(class_='position').text.strip('#'))
-        points = int(team.find(class_='points').text.strip('()').split(' ')[0])
-        href = team.find(
-            attrs={
-                'data-link-tracking-destination': 'Click on HLTV Team profile [button]'
-            }
-        )['href']
+# store the team name, rank, and points of every team on the page
+#
+# returns the (hltv_id, name) of every team on the page
+def process_page(date, ranked_teams):
+    page_teams = []
 
+    for team in ranked_teams:
+        name = team['name']
+        href = team['href']
         hltv_id = href.split('/')[2]
 
-        logo_url = team.find(class_='team-logo').find('img')['src']
-
         teams_lock.acquire()
         if name not in teams:
             teams[name] = dict()
 
         teams[name][date] = {
-            'rank': rank,
-            'points': points,
+            'rank': team['rank'],
+            'points': team['points'],
             'href': href
         }
-        teams[name]['logo_url'] = logo_url
+        teams[name]['logo_url'] = team['logo_url']
         teams[name]['hltv_id'] = hltv_id
         teams_lock.release()
 
+        page_teams.append((int(hltv_id), name))
 
-# fetch page source for a given date
-def get_page_soup(date):
-    print('Getting data for %s-%s-%s' % (date.year, date.month, date.day))
-    url = base_url + str(date.year) + '/' + date.strftime("%B").lower() + '/' + str(date.day)
+    return page_teams
 
-    p = subprocess.run(['curl', url],
-                       stdout=subprocess.PIPE,
-                       stderr=subprocess.DEVNULL)
 
-    page = p.stdout
-    soup = BeautifulSoup(page, 'html.parser')
+# stream the ranking page for a given date, yielding each team as soon as it
+# has been parsed
+def get_page_teams(date):
+    print('Getting data for %s-%s-%s' % (date.year, date.month, date.day))
+    url = base_url + str(date.year) + '/' + date.strftime("%B").lower() + '/' + str(date.day)
 
-    return soup
+    return stream_parse.stream_url(url, stream_parse.RankingExtractor())
 
 
 def create_tables(cur):
@@ -211,81 +193,88 @@ def create_tables(cur):
             )'
         )
 
+    changes.create_tables(cur)
+
+
+def insert_team(cur, hltv_id, team, color, force_update):
+    if force_update:
+        changes.record_team(cur, hltv_id, team, color)
+
+        cur.execute(
+            'INSERT INTO public.teams VALUES (%s, %s, %s) \
+                    ON CONFLICT (hltv_id) DO UPDATE \
+                SET hltv_id = excluded.hltv_id,\
+                    team = excluded.team,\
+                    color = excluded.color',
+            (hltv_id, team, color)
+        )
+    else:
+        cur.execute(
+            'INSERT INTO public.teams VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
+            (hltv_id, team, color)
+        )
+
+
+# returns whether the row was inserted or changed, so that the changes of its
+# ranking can be published
+def insert_rank(cur, date, team, rank, points, force_update):
+    if force_update:
+        cur.execute(
+            'INSERT INTO public.ranks VALUES (%s, %s, %s, %s) \
+                ON CONFLICT (date, team) DO UPDATE \
+                SET date = excluded.date,\
+                    team = excluded.team,\
+                    rank = excluded.rank,\
+                    points = excluded.points \
+                WHERE (ranks.rank, ranks.points) \
+                    IS DISTINCT FROM (excluded.rank, excluded.points)',
+            (date.isoformat(), team, rank, points)
+        )
+
+    else:
+        cur.execute(
+            'INSERT INTO public.ranks VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING',
+            (date.isoformat(), team, rank, points)
+        )
+
+    return cur.rowcount > 0
+
 
-def insert_data(cur, teams):
+# returns the dates of the rankings that were inserted or changed
+def insert_data(cur, teams, force_update):
+    # a team renamed between the scraped rankings is in teams under each of
+    # its names; it is stored once, with the name and color of its newest
+    # ranking
+    newest = dict()
     for team in teams:
-        if args.force_update:
-            cur.execute(
-                'INSERT INTO public.teams VALUES (%s, %s, %s) \
-                        ON CONFLICT (hltv_id) DO UPDATE \
-                    SET hltv_id = excluded.hltv_id,\
-                        team = excluded.team,\
-                        color = excluded.color',
-                (teams[team]['hltv_id'], team, teams[team]['color'])
-            )
-        else:
-            cur.execute(
-                'INSERT INTO public.teams VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
-                (teams[team]['hltv_id'], team, teams[team]['color'])
-            )
+        hltv_id = int(teams[team]['hltv_id'])
+        last = max(date for date in teams[team] if type(date) == datetime.date)
+
+        if hltv_id not in newest or last > newest[hltv_id][0]:
+            newest[hltv_id] = (last, team)
+
+    for hltv_id, (last, team) in sorted(newest.items()):
+        insert_team(cur, hltv_id, team, teams[team]['color'], force_update)
+
+    changed_dates = set()
 
+    for team in teams:
         for date in teams[team]:
             if type(date) != datetime.date:
                 continue
 
             row = teams[team][date]
 
-            if args.force_update:
-                cur.execute(
-                    'INSERT INTO public.ranks VALUES (%s, %s, %s, %s) \
-                        ON CONFLICT (date, team) DO UPDATE \
-                        SET date = excluded.date,\
-                            team = excluded.team,\
-                            rank = excluded.rank,\
-                            points = excluded.points',
-                    (date.isoformat(), team, row['rank'], row['points'])
-                )
-
-            else:
-                cur.execute(
-                    'INSERT INTO public.ranks VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING',
-                    (date.isoformat(), team, row['rank'], row['points'])
-                )
-
-
-def parse_arguments():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--dbname', help='name of the database to connect to')
-    parser.add_argument('--role', help='role to access this database with')
-
-    parser.add_argument(
-        '--update-all',
-        help='do not try to skip data that is already in the database',
-        action='store_true',
-        default=False
-    )
-
-    parser.add_argument(
-        '--force-update',
-        help='use scraped data for any conflicts in database',
-        action='store_true',
-        default=False
-    )
-
-    global args
-    args = parser.parse_args()
-
-
-def main():
-    parse_arguments()
+            if insert_rank(cur, date, team, row['rank'], row['points'],
+                           force_update):
+                changed_dates.add(date)
 
-    conn = common.connect_to_db(args)
+    return changed_dates
 
-    cur = conn.cursor()
-
-    create_tables(cur)
-    conn.commit()
 
+# dates of all rankings that still need to be scraped
+def get_dates(cur, update_all):
+    dates = []
     prev = datetime.date.fromisoformat('2015-09-28')
     end = datetime.date.today()
 
@@ -303,40 +292,15 @@ def main():
     cur.execute('SELECT MAX(date) FROM ranks')
     latest = cur.fetchone()[0]
 
-    if not args.update_all and latest is not None:
+    if not update_all and latest is not None:
         index = dates.index(latest) + 1
     else:
         index = 0
 
-    # i = 0
-    # index = 60
-    for date in dates[index:]:
-        # if i > 10:
-            # break
-        dates_queue.put(date)
-        # i += 1
-
-    num_threads = multiprocessing.cpu_count()
-    threads = []
-
-    # launch threads
-    for i in range(num_threads):
-        thread = threading.Thread(target=thread_work)
-        thread.start()
-        threads.append(thread)
-
-    # wait for all the dates to be processed
-    dates_queue.join()
-
-    # tell threads to exit
-    for i in range(num_threads):
-        dates_queue.put(None)
+    return dates[index:]
 
-    # wait for threads to finish
-    for t in threads:
-        t.join()
 
-    # get team colors
+def add_team_colors():
     for team in teams:
         print('Getting color for %s' % (team))
         color = dominant_color_url(teams[team]['logo_url'])
@@ -346,12 +310,39 @@ def main():
     if os.path.exists(logos_path):
         shutil.rmtree(logos_path)
 
-    insert_data(cur, teams)
 
+def run(args):
+    conn = common.connect_to_db(args)
+
+    cur = conn.cursor()
+
+    create_tables(cur)
     conn.commit()
+
+    dates_queue = queue.Queue()
+
+    for date in get_dates(cur, args.update_all):
+        dates_queue.put(date)
+
+    common.run_thread_pool(dates_queue, thread_work)
+
+    add_team_colors()
+
+    # no other run can add changes until this one commits, so the changes
+    # after since are those of this run
+    changes.lock(cur)
+    since = changes.last_seq(cur)
+
+    changed_dates = insert_data(cur, teams, args.force_update)
+    changes.publish_weeks(cur, changed_dates)
+
+    conn.commit()
+
+    changes.append_ndjson(cur, args.changes_ndjson, since)
     cur.close()
     conn.close()
 
 
 if __name__ == '__main__':
-    main()
+    import hltv_stats
+    hltv_stats.main(['scrape-teams'] + sys.argv[1:])
@@ -0,0 +1,197 @@
+# Incremental extraction of teams and players from HLTV pages
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import codecs
+import subprocess
+from html.parser import HTMLParser
+
+
+# elements that never have an end tag
+void_tags = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+}
+
+chunk_size = 16384
+
+
+# event driven parser that only keeps state for the elements with all of
+# block_classes and drops everything else on the page
+#
+# a record is started when a block opens and is appended to records when the
+# block closes; callers collect finished records with drain()
+class BlockExtractor(HTMLParser):
+    block_classes = set()
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records = []
+        self.record = None
+
+        # (tag, field) of every element open inside the current block; text
+        # inside the element is added to record[field] when field is set and
+        # is in the record
+        self.stack = []
+
+    def drain(self):
+        records = self.records
+        self.records = []
+        return records
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get('class') or '').split())
+
+        if self.record is None:
+            if self.block_classes <= classes and tag not in void_tags:
+                self.record = self.start_block()
+                self.stack = [(tag, None)]
+            return
+
+        field = self.block_starttag(tag, attrs, classes)
+
+        if tag not in void_tags:
+            self.stack.append((tag, field))
+
+    def handle_endtag(self, tag):
+        if self.record is None:
+            return
+
+        # close the most recent element with this tag along with anything
+        # left open inside it
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                break
+        else:
+            return
+
+        if not self.stack:
+            record = self.finish_block(self.record)
+            if record is not None:
+                self.records.append(record)
+            self.record = None
+
+    def handle_data(self, data):
+        if self.record is None:
+            return
+
+        for _, field in self.stack:
+            if field is not None and field in self.record:
+                self.record[field] += data
+
+    # returns the record to fill in for a new block
+    def start_block(self):
+        return dict()
+
+    # returns the field the element is tracked under, or None
+    def block_starttag(self, tag, attrs, classes):
+        return None
+
+    # returns the finished record, or None to drop the block
+    def finish_block(self, record):
+        return record
+
+
+# one record per team in a world ranking page with the same values the
+# scraper used to read from the div.ranked-team.standard-box elements
+class RankingExtractor(BlockExtractor):
+    block_classes = {'ranked-team', 'standard-box'}
+
+    text_fields = ('name', 'position', 'points')
+
+    def block_starttag(self, tag, attrs, classes):
+        record = self.record
+
+        if tag == 'a' and attrs.get('data-link-tracking-destination') == \
+                'Click on HLTV Team profile [button]':
+            record.setdefault('href', attrs.get('href'))
+
+        if tag == 'img' and 'logo_url' not in record:
+            in_logo = 'team-logo' in classes or \
+                any(field == 'team-logo' for _, field in self.stack)
+            if in_logo:
+                record['logo_url'] = attrs.get('src')
+
+        # only the first element with each class is used
+        for field in self.text_fields:
+            if field in classes and field not in record:
+                record[field] = ''
+                return field
+
+        # never a key of record, only marks images as being inside the logo
+        if 'team-logo' in classes:
+            return 'team-logo'
+
+        return None
+
+    required_fields = ('name', 'position', 'points', 'href', 'logo_url')
+
+    def finish_block(self, record):
+        # a malformed team is skipped rather than ending the whole page
+        if any(record.get(field) is None for field in self.required_fields):
+            return None
+
+        return {
+            'name': record['name'],
+            'rank': int(record['position'].strip().strip('#')),
+            'points': int(record['points'].strip().strip('()').split(' ')[0]),
+            'href': record['href'],
+            'logo_url': record['logo_url'],
+        }
+
+
+# one record per player link in the bodyshot-team element of a team page
+#
+# players are emitted as soon as their link opens since everything needed is
+# in its attributes
+class RosterExtractor(BlockExtractor):
+    block_classes = {'bodyshot-team'}
+
+    def block_starttag(self, tag, attrs, classes):
+        if tag == 'a' and attrs.get('href'):
+            self.records.append({
+                'name': attrs.get('title'),
+                'href': attrs['href'],
+            })
+
+        return None
+
+    def finish_block(self, record):
+        return None
+
+
+# feed the output of a file-like object to extractor chunk by chunk, yielding
+# records as soon as they are complete
+def stream_records(f, extractor):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    for chunk in iter(lambda: f.read(chunk_size), b''):
+        extractor.feed(decoder.decode(chunk))
+        yield from extractor.drain()
+
+    extractor.feed(decoder.decode(b'', final=True))
+    extractor.close()
+    yield from extractor.drain()
+
+
+# fetch url with curl and yield the records extractor finds as the response
+# streams in, without ever holding the whole page
+def stream_url(url, extractor):
+    with subprocess.Popen(['curl', url],
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL) as p:
+        yield from stream_records(p.stdout, extractor)
@@ -0,0 +1,137 @@
+# Durable work queue in the HLTV database shared by distributed workers
+# Copyright (C) 2018  David Hughes
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# items are (kind, key) pairs with an optional payload string; a worker leases
+# an item for a number of seconds and marks it done in the same transaction
+# that stores its results, so an item whose worker died is simply leased again
+# once the lease expires
+
+# items that failed this many times are left alone
+max_attempts = 5
+
+
+def create_tables(cur):
+    cur.execute('SELECT to_regclass(%s)', ('public.work_queue',))
+    if cur.fetchone() != ('work_queue',):
+        cur.execute(
+            'CREATE TABLE work_queue (\
+                kind varchar,\
+                key varchar,\
+                payload varchar,\
+                done boolean DEFAULT false,\
+                attempts int DEFAULT 0,\
+                leased_by varchar,\
+                leased_until timestamptz,\
+                PRIMARY KEY(kind, key)\
+            )'
+        )
+
+
+# add an item to the queue, or with reset, run an item again even if it is done
+def enqueue(cur, kind, key, payload=None, reset=False):
+    if reset:
+        cur.execute(
+            'INSERT INTO public.work_queue (kind, key, payload) \
+                VALUES (%s, %s, %s) \
+                ON CONFLICT (kind, key) DO UPDATE \
+                SET payload = excluded.payload,\
+                    done = false,\
+                    attempts = 0',
+            (kind, key, payload)
+        )
+    else:
+        cur.execute(
+            'INSERT INTO public.work_queue (kind, key, payload) \
+                VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
+            (kind, key, payload)
+        )
+
+
+# add an item, replacing the payload of an existing item when its json field
+# is missing or older than value, e.g. a team seen in a newer ranking
+#
+# an item that is replaced is run again, and a worker currently holding it
+# loses its lease so that it cannot complete the item with the old payload
+#
+# unlike ON CONFLICT DO UPDATE, the separate UPDATE only locks rows that are
+# actually replaced, so transactions queueing the same items rarely block
+# each other; callers should still queue items in a consistent order
+def enqueue_newer(cur, kind, key, payload, field, value):
+    enqueue(cur, kind, key, payload)
+
+    cur.execute(
+        'UPDATE public.work_queue \
+            SET payload = %s,\
+                done = false,\
+                attempts = 0,\
+                leased_by = NULL,\
+                leased_until = NULL \
+            WHERE kind = %s AND key = %s \
+                AND ((payload::jsonb ->> %s) IS NULL \
+                    OR (payload::jsonb ->> %s) < %s)',
+        (payload, kind, key, field, field, value)
+    )
+
+
+# lease the next available item for lease_seconds
+#
+# returns (kind, key, payload), or None if every remaining item is leased by
+# another worker; the caller must commit for the lease to be seen by others
+def lease(cur, worker, lease_seconds):
+    cur.execute(
+        'UPDATE public.work_queue \
+            SET leased_by = %s,\
+                leased_until = now() + %s * interval \'1 second\',\
+                attempts = attempts + 1 \
+            WHERE (kind, key) = (\
+                SELECT kind, key FROM public.work_queue \
+                    WHERE NOT done AND attempts < %s \
+                        AND (leased_until IS NULL OR leased_until < now()) \
+                    ORDER BY kind, key \
+                    LIMIT 1 \
+                    FOR UPDATE SKIP LOCKED\
+            ) \
+            RETURNING kind, key, payload',
+        (worker, lease_seconds, max_attempts)
+    )
+
+    return cur.fetchone()
+
+
+# mark a leased item done, if worker still holds the lease
+#
+# returns False when the lease expired and the item may have been given to
+# another worker, in which case the caller must roll back its results
+def complete(cur, kind, key, worker):
+    cur.execute(
+        'UPDATE public.work_queue \
+            SET done = true, leased_by = NULL, leased_until = NULL \
+            WHERE kind = %s AND key = %s \
+                AND leased_by = %s AND leased_until > clock_timestamp()',
+        (kind, key, worker)
+    )
+
+    return cur.rowcount == 1
+
+
+# number of items that still need to be processed, leased or not
+def remaining(cur):
+    cur.execute(
+        'SELECT COUNT(*) FROM public.work_queue WHERE NOT done AND attempts < %s',
+        (max_attempts,)
+    )
+
+    return cur.fetchone()[0]
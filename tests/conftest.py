@@ -0,0 +1,103 @@
+import os
+import pwd
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# the modules in src are scripts that import each other by name
+sys.path.insert(0, SRC_DIR)
+
+DB_ROLE = 'hltv'
+
+
+def find_pg_bin():
+    pg_bin = os.environ.get('PG_BIN')
+    if pg_bin is None:
+        initdb = shutil.which('initdb')
+        pg_bin = os.path.dirname(initdb) if initdb else None
+    if pg_bin is None or not os.path.exists(os.path.join(pg_bin, 'initdb')):
+        return None
+    return pg_bin
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Postgres:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.databases = 0
+
+    def connect(self, dbname):
+        import psycopg2
+        return psycopg2.connect(dbname=dbname, user=DB_ROLE,
+                                host=self.host, port=self.port)
+
+    # returns the name of a new, empty database
+    def create_database(self):
+        self.databases += 1
+        dbname = 'test_db_%d' % (self.databases,)
+
+        conn = self.connect('postgres')
+        conn.autocommit = True
+        conn.cursor().execute('CREATE DATABASE %s' % (dbname,))
+        conn.close()
+
+        return dbname
+
+    def cli_args(self, dbname):
+        return ['--dbname', dbname, '--role', DB_ROLE,
+                '--host', self.host, '--port', str(self.port)]
+
+
+# a throwaway postgres cluster, from the binaries on PATH or in PG_BIN
+@pytest.fixture(scope='session')
+def postgres():
+    pytest.importorskip('psycopg2')
+
+    pg_bin = find_pg_bin()
+    if pg_bin is None:
+        pytest.skip('postgres binaries not found, set PG_BIN')
+
+    # postgres refuses to run as root
+    run_as = []
+    if os.geteuid() == 0:
+        if shutil.which('runuser') is None:
+            pytest.skip('running as root without runuser')
+        run_as = ['runuser', '-u', 'nobody', '--']
+
+    base = tempfile.mkdtemp(prefix='hltv-pg-')
+    if run_as:
+        os.chown(base, pwd.getpwnam('nobody').pw_uid, -1)
+
+    data = os.path.join(base, 'data')
+    port = free_port()
+
+    def pg(*argv):
+        subprocess.run(run_as + [os.path.join(pg_bin, argv[0])] + list(argv[1:]),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+
+    pg('initdb', '-D', data, '-U', DB_ROLE, '-A', 'trust')
+    pg('pg_ctl', '-D', data, '-l', os.path.join(base, 'log'), '-w',
+       '-o', "-k %s -p %d -c listen_addresses=''" % (base, port), 'start')
+
+    yield Postgres(base, port)
+
+    pg('pg_ctl', '-D', data, '-m', 'immediate', '-w', 'stop')
+    shutil.rmtree(base, ignore_errors=True)
+
+
+@pytest.fixture
+def database(postgres):
+    return postgres.create_database()
@@ -0,0 +1,137 @@
+# runs the hltv_stats CLI against generated HLTV pages instead of the network
+#
+#     python tests/fake_hltv.py <hltv_stats arguments>
+
+import datetime
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+)
+
+import hltv_stats  # noqa: E402
+import scrape_teams  # noqa: E402
+import stream_parse  # noqa: E402
+
+# a short history keeps the tests fast
+DATES = [
+    datetime.date(2019, 1, 7) + datetime.timedelta(weeks=i) for i in range(30)
+]
+
+TEAM_IDS = list(range(1000, 1040))
+
+# seconds each fetch takes, so workers can be killed mid item
+FETCH_DELAY = 0.01
+
+RANKING_TEAM = '''
+<div class="ranked-team standard-box">
+  <div class="ranking-header">
+    <span class="position">#%(rank)d</span>
+    <span class="team-logo"><img alt="%(name)s" src="https://static.hltv.org/images/team/logo/%(id)d" class="team-logo"></span>
+    <div class="relative"><div class="teamLine">
+      <span class="name">%(name)s</span><span class="points">(%(points)d points)</span>
+    </div></div>
+  </div>
+  <div class="lineup-con hidden"><div class="more">
+    <a href="/team/%(id)d/%(slug)s" class="moreLink" data-link-tracking-destination="Click on HLTV Team profile [button]">HLTV Team profile</a>
+  </div></div>
+</div>
+'''
+
+ROSTER_PLAYER = '''
+  <a href="/player/%(id)d/%(name)s" class="col-custom" title="%(name)s">
+    <div class="playerFlagName"><span class="text-ellipsis bold">%(name)s</span></div>
+  </a>
+'''
+
+
+def team_name(hltv_id, date):
+    # team 1000 is renamed half way through the history
+    if hltv_id == 1000 and date >= DATES[len(DATES) // 2]:
+        return 'Renamed Team'
+    return 'Team %d' % (hltv_id,)
+
+
+def ranking_page(date):
+    # FAKE_UNPUBLISHED names a date whose ranking has no teams yet
+    if os.environ.get('FAKE_UNPUBLISHED') == date.isoformat():
+        return '<html><body><div class="ranking"></div></body></html>'
+
+    rng = random.Random(date.toordinal())
+    ids = rng.sample(TEAM_IDS, 30)
+
+    teams = []
+    for rank, hltv_id in enumerate(ids, 1):
+        name = team_name(hltv_id, date)
+        teams.append(RANKING_TEAM % {
+            'rank': rank,
+            'id': hltv_id,
+            'name': name,
+            'slug': name.lower().replace(' ', '-'),
+            'points': 1000 - rank * 10 - rng.randrange(5),
+        })
+
+    return '<html><body><div class="ranking">%s</div></body></html>' % (
+        ''.join(teams),
+    )
+
+
+def team_page(hltv_id):
+    players = [
+        ROSTER_PLAYER % {'id': hltv_id * 10 + i, 'name': 'p%d_%d' % (hltv_id, i)}
+        for i in range(5)
+    ]
+
+    return '<html><body><div class="bodyshot-team g-grid">%s</div></body></html>' % (
+        ''.join(players),
+    )
+
+
+def stream_url(url, extractor):
+    time.sleep(FETCH_DELAY)
+
+    # FAKE_FETCH_LOG names a file that every fetched url is appended to
+    if 'FAKE_FETCH_LOG' in os.environ:
+        with open(os.environ['FAKE_FETCH_LOG'], 'a') as f:
+            f.write(url + '\n')
+
+    if url.startswith(scrape_teams.base_url):
+        date = datetime.datetime.strptime(
+            url[len(scrape_teams.base_url):], '%Y/%B/%d'
+        ).date()
+        page = ranking_page(date)
+    else:
+        page = team_page(int(url.split('/')[4]))
+
+    return stream_parse.stream_records(io.BytesIO(page.encode()), extractor)
+
+
+def dominant_color_url(url):
+    salt = int(os.environ.get('FAKE_COLOR_SALT', '0'))
+    return '#%06x' % ((int(url.split('/')[-1]) * 4099 + salt) % 0xffffff,)
+
+
+# the dates after the newest stored ranking, as scrape_teams.get_dates
+def get_dates(cur, update_all):
+    cur.execute('SELECT MAX(date) FROM ranks')
+    latest = cur.fetchone()[0]
+
+    if update_all or latest is None:
+        return list(DATES)
+
+    return [date for date in DATES if date > latest]
+
+
+def patch():
+    stream_parse.stream_url = stream_url
+    scrape_teams.dominant_color_url = dominant_color_url
+    scrape_teams.get_dates = get_dates
+
+
+if __name__ == '__main__':
+    patch()
+    hltv_stats.main(sys.argv[1:])
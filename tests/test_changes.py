@@ -0,0 +1,206 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+import changes
+import scrape_teams
+
+FAKE_HLTV = os.path.join(os.path.dirname(__file__), 'fake_hltv.py')
+
+WEEKS = [datetime.date(2019, 1, 7) + datetime.timedelta(weeks=i)
+         for i in range(3)]
+
+# {date: [(team, rank, points)]}
+RANKINGS = {
+    WEEKS[0]: [('a', 1, 300), ('b', 2, 200), ('c', 3, 100)],
+    WEEKS[1]: [('b', 1, 310), ('a', 2, 290), ('c', 3, 100)],
+    WEEKS[2]: [('b', 1, 320), ('a', 2, 280), ('d', 3, 90)],
+}
+
+
+def connect(postgres, database):
+    conn = postgres.connect(database)
+    cur = conn.cursor()
+    scrape_teams.create_tables(cur)
+    return conn, cur
+
+
+def store(cur, date, ranking=None, force_update=False):
+    changed = False
+    for team, rank, points in ranking or RANKINGS[date]:
+        if scrape_teams.insert_rank(cur, date, team, rank, points,
+                                    force_update):
+            changed = True
+    return changed
+
+
+def read_changes(cur, since=0):
+    cur.execute(
+        'SELECT kind, date, team, data FROM rank_changes \
+            WHERE seq > %s ORDER BY seq',
+        (since,)
+    )
+    return cur.fetchall()
+
+
+def weeks(rows):
+    return [(kind, date, data['previous']) for kind, date, team, data in rows
+            if kind in changes.week_kinds]
+
+
+def test_new_weeks_are_published(postgres, database):
+    conn, cur = connect(postgres, database)
+
+    for date in WEEKS:
+        store(cur, date)
+    changes.publish_weeks(cur, set(WEEKS))
+
+    rows = read_changes(cur)
+
+    assert weeks(rows) == [
+        ('week_published', WEEKS[0], None),
+        ('week_published', WEEKS[1], WEEKS[0].isoformat()),
+        ('week_published', WEEKS[2], WEEKS[1].isoformat()),
+    ]
+    assert [(kind, team) for kind, date, team, data in rows
+            if date == WEEKS[2] and team is not None] == [
+        ('rank_changed', 'b'),
+        ('rank_changed', 'a'),
+        ('team_entered', 'd'),
+        ('team_left', 'c'),
+    ]
+
+    conn.close()
+
+
+def test_unchanged_ranking_is_not_published_again(postgres, database):
+    conn, cur = connect(postgres, database)
+
+    store(cur, WEEKS[0])
+    changes.publish_weeks(cur, {WEEKS[0]})
+    since = changes.last_seq(cur)
+
+    assert not store(cur, WEEKS[0], force_update=True)
+    assert read_changes(cur, since) == []
+
+    conn.close()
+
+
+def test_correction_revises_week_and_next(postgres, database):
+    conn, cur = connect(postgres, database)
+
+    for date in WEEKS:
+        store(cur, date)
+    changes.publish_weeks(cur, set(WEEKS))
+    since = changes.last_seq(cur)
+
+    corrected = [('b', 1, 315), ('a', 2, 290), ('c', 3, 100)]
+    assert store(cur, WEEKS[1], corrected, force_update=True)
+    changes.publish_weeks(cur, {WEEKS[1]})
+
+    rows = read_changes(cur, since)
+
+    assert weeks(rows) == [
+        ('week_revised', WEEKS[1], WEEKS[0].isoformat()),
+        ('week_revised', WEEKS[2], WEEKS[1].isoformat()),
+    ]
+    points_delta = {
+        (date, team): data['points_delta'] for kind, date, team, data in rows
+        if kind == 'rank_changed' and team == 'b'
+    }
+    assert points_delta == {(WEEKS[1], 'b'): 115, (WEEKS[2], 'b'): 5}
+
+    conn.close()
+
+
+def test_late_week_is_published_and_next_revised(postgres, database):
+    conn, cur = connect(postgres, database)
+
+    store(cur, WEEKS[0])
+    store(cur, WEEKS[2])
+    changes.publish_weeks(cur, {WEEKS[0], WEEKS[2]})
+    since = changes.last_seq(cur)
+
+    store(cur, WEEKS[1])
+    changes.publish_weeks(cur, {WEEKS[1]})
+
+    assert weeks(read_changes(cur, since)) == [
+        ('week_published', WEEKS[1], WEEKS[0].isoformat()),
+        ('week_revised', WEEKS[2], WEEKS[1].isoformat()),
+    ]
+
+    conn.close()
+
+
+def test_first_run_publishes_stored_weeks(postgres, database):
+    conn, cur = connect(postgres, database)
+
+    for date in WEEKS:
+        store(cur, date)
+    changes.publish_weeks(cur, set())
+
+    assert [kind for kind, date, previous in weeks(read_changes(cur))] == \
+        ['week_published'] * 3
+
+    conn.close()
+
+
+def scrape_teams_cli(postgres, database, *argv):
+    subprocess.run(
+        [sys.executable, FAKE_HLTV, 'scrape-teams'] +
+        postgres.cli_args(database) + list(argv),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True
+    )
+
+
+def test_renamed_team_is_recorded_once(postgres, database):
+    scrape_teams_cli(postgres, database)
+
+    conn, cur = connect(postgres, database)
+
+    # team 1000 is ranked under both names and keeps the newest one
+    cur.execute('SELECT team FROM teams WHERE hltv_id = 1000')
+    assert cur.fetchone() == ('Renamed Team',)
+
+    cur.execute("UPDATE teams SET team = 'Old Name' WHERE hltv_id = 1000")
+    conn.commit()
+
+    scrape_teams_cli(postgres, database, '--update-all', '--force-update')
+    scrape_teams_cli(postgres, database, '--update-all', '--force-update')
+
+    renames = [
+        (team, data) for kind, date, team, data in read_changes(cur)
+        if kind == 'name_changed'
+    ]
+    assert renames == [
+        ('Renamed Team', {'hltv_id': 1000, 'previous_name': 'Old Name'}),
+    ]
+
+    conn.close()
+
+
+def test_changes_ndjson_has_the_changes_of_the_run(postgres, database,
+                                                    tmp_path):
+    path = tmp_path / 'changes.ndjson'
+
+    scrape_teams_cli(postgres, database)
+
+    conn, cur = connect(postgres, database)
+    since = changes.last_seq(cur)
+    cur.execute("UPDATE ranks SET points = points + 1 WHERE rank = 1")
+    conn.commit()
+
+    scrape_teams_cli(postgres, database, '--update-all', '--force-update',
+                     '--changes-ndjson', str(path))
+
+    cur.execute('SELECT seq FROM rank_changes WHERE seq > %s ORDER BY seq',
+                (since,))
+    seqs = [seq for seq, in cur.fetchall()]
+
+    with open(path) as f:
+        assert [json.loads(line)['seq'] for line in f] == seqs
+    assert seqs
+
+    conn.close()
@@ -0,0 +1,48 @@
+import queue
+import threading
+
+import common
+
+
+def test_thread_pool_processes_items_added_by_handlers():
+    work_queue = queue.LifoQueue()
+    seen = []
+    seen_lock = threading.Lock()
+
+    def handler(item):
+        with seen_lock:
+            seen.append(item)
+        if item < 5:
+            work_queue.put(item + 10)
+
+    for i in range(5):
+        work_queue.put(i)
+
+    common.run_thread_pool(work_queue, handler)
+
+    assert sorted(seen) == [0, 1, 2, 3, 4, 10, 11, 12, 13, 14]
+
+
+def test_thread_pool_survives_failing_handler(capsys):
+    work_queue = queue.Queue()
+    seen = []
+
+    def handler(item):
+        if item == 2:
+            raise ValueError('bad page')
+        seen.append(item)
+
+    for i in range(5):
+        work_queue.put(i)
+
+    # run in a thread so a regression fails the test instead of hanging it
+    pool = threading.Thread(
+        target=common.run_thread_pool, args=(work_queue, handler),
+        daemon=True
+    )
+    pool.start()
+    pool.join(timeout=10)
+
+    assert not pool.is_alive()
+    assert sorted(seen) == [0, 1, 3, 4]
+    assert 'bad page' in capsys.readouterr().err
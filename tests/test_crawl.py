@@ -0,0 +1,44 @@
+import collections
+import os
+import subprocess
+import sys
+
+import fake_hltv
+
+FAKE_HLTV = os.path.join(os.path.dirname(__file__), 'fake_hltv.py')
+
+
+def test_crawl_stores_every_roster_once(postgres, database, tmp_path):
+    log = tmp_path / 'fetches'
+
+    subprocess.run(
+        [sys.executable, FAKE_HLTV, 'crawl'] + postgres.cli_args(database),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+        env=dict(os.environ, FAKE_FETCH_LOG=str(log))
+    )
+
+    conn = postgres.connect(database)
+    cur = conn.cursor()
+
+    cur.execute('SELECT COUNT(*) FROM ranks')
+    assert cur.fetchone() == (30 * len(fake_hltv.DATES),)
+
+    cur.execute('SELECT hltv_id FROM teams')
+    team_ids = {hltv_id for hltv_id, in cur.fetchall()}
+    assert team_ids == set(fake_hltv.TEAM_IDS)
+
+    # player ids are made from the id of their team
+    cur.execute('SELECT hltv_id FROM players')
+    player_ids = [hltv_id for hltv_id, in cur.fetchall()]
+    assert len(player_ids) == 5 * len(team_ids)
+    assert {hltv_id // 10 for hltv_id in player_ids} == team_ids
+
+    conn.close()
+
+    # team 1000 is ranked under two names but its page is fetched once
+    with open(log) as f:
+        urls = [url.split('/') for url in f.read().split()]
+    team_fetches = collections.Counter(
+        int(url[4]) for url in urls if url[3] == 'team'
+    )
+    assert team_fetches == collections.Counter(fake_hltv.TEAM_IDS)
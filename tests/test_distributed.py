@@ -0,0 +1,206 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import fake_hltv
+import work_queue
+
+FAKE_HLTV = os.path.join(os.path.dirname(__file__), 'fake_hltv.py')
+
+WORKERS = 4
+
+TIMEOUT = 120
+
+
+def hltv_stats(postgres, dbname, *argv, env=None, wait=True):
+    argv = [sys.executable, FAKE_HLTV, argv[0]] + \
+        postgres.cli_args(dbname) + list(argv[1:])
+    p = subprocess.Popen(argv, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.PIPE,
+                         env=dict(os.environ, **(env or {})))
+    if wait:
+        _, err = p.communicate(timeout=TIMEOUT)
+        assert p.returncode == 0, err.decode()
+    return p
+
+
+def query(postgres, dbname, sql):
+    conn = postgres.connect(dbname)
+    cur = conn.cursor()
+    cur.execute(sql)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def snapshot(postgres, dbname):
+    return {
+        table: sorted(query(postgres, dbname, 'SELECT * FROM %s' % (table,)))
+        for table in ('ranks', 'teams', 'players')
+    }
+
+
+def run_workers(postgres, dbname, count, *argv, kill_after=None):
+    workers = [
+        hltv_stats(postgres, dbname, 'work', '--lease-seconds', '2',
+                   '--poll-seconds', '0.1', *argv, wait=False)
+        for i in range(count)
+    ]
+
+    killed = None
+    if kill_after is not None:
+        deadline = time.time() + TIMEOUT
+        while query(postgres, dbname,
+                    'SELECT COUNT(*) FROM work_queue WHERE done')[0][0] < kill_after:
+            assert time.time() < deadline
+            time.sleep(0.05)
+
+        killed = workers.pop(0)
+        killed.send_signal(signal.SIGKILL)
+        killed.wait()
+
+    for w in workers:
+        _, err = w.communicate(timeout=TIMEOUT)
+        assert w.returncode == 0, err.decode()
+
+    return killed
+
+
+def test_workers_match_single_process(postgres):
+    single = postgres.create_database()
+    hltv_stats(postgres, single, 'enqueue')
+    run_workers(postgres, single, 1, '--force-update')
+
+    # with --force-update the newest ranking decides each team's name, as
+    # without it the first team item to finish would, whatever its date
+    multi = postgres.create_database()
+    hltv_stats(postgres, multi, 'enqueue')
+    killed = run_workers(postgres, multi, WORKERS, '--force-update',
+                         kill_after=10)
+
+    assert killed.returncode == -signal.SIGKILL
+
+    assert query(postgres, multi,
+                 'SELECT COUNT(*) FROM work_queue WHERE NOT done') == [(0,)]
+
+    expected = snapshot(postgres, single)
+    assert len(expected['ranks']) == 30 * 30
+    assert len(expected['players']) == 5 * len(expected['teams'])
+    assert (1000, 'Renamed Team') in [row[:2] for row in expected['teams']]
+    assert snapshot(postgres, multi) == expected
+
+
+def test_rerun_is_idempotent(postgres, database):
+    hltv_stats(postgres, database, 'enqueue')
+    run_workers(postgres, database, WORKERS, '--force-update')
+    before = snapshot(postgres, database)
+
+    hltv_stats(postgres, database, 'enqueue', '--update-all')
+    run_workers(postgres, database, WORKERS, '--force-update')
+
+    assert snapshot(postgres, database) == before
+
+
+def test_force_update_refreshes_known_teams(postgres, database):
+    hltv_stats(postgres, database, 'enqueue')
+    run_workers(postgres, database, WORKERS)
+    colors = dict(query(postgres, database, 'SELECT hltv_id, color FROM teams'))
+
+    # the teams are now in the database and get queued without a logo
+    env = {'FAKE_COLOR_SALT': '1'}
+    hltv_stats(postgres, database, 'enqueue', '--update-all')
+    workers = [
+        hltv_stats(postgres, database, 'work', '--force-update',
+                   '--poll-seconds', '0.1', env=env, wait=False)
+        for i in range(WORKERS)
+    ]
+    for w in workers:
+        _, err = w.communicate(timeout=TIMEOUT)
+        assert w.returncode == 0, err.decode()
+
+    refreshed = dict(query(postgres, database,
+                           'SELECT hltv_id, color FROM teams'))
+
+    assert refreshed.keys() == colors.keys()
+    assert all(refreshed[i] != colors[i] for i in colors)
+
+
+def test_unpublished_date_is_scraped_later(postgres, database):
+    last = fake_hltv.DATES[-1]
+
+    # the newest ranking is empty on every attempt of the first run
+    hltv_stats(postgres, database, 'enqueue')
+    workers = [
+        hltv_stats(postgres, database, 'work', '--lease-seconds', '1',
+                   '--poll-seconds', '0.1',
+                   env={'FAKE_UNPUBLISHED': last.isoformat()}, wait=False)
+        for i in range(2)
+    ]
+    for w in workers:
+        _, err = w.communicate(timeout=TIMEOUT)
+        assert w.returncode == 0, err.decode()
+
+    assert query(postgres, database,
+                 'SELECT done, attempts FROM work_queue WHERE key = \'%s\''
+                 % (last.isoformat(),)) == [(False, work_queue.max_attempts)]
+    assert query(postgres, database, 'SELECT MAX(date) FROM ranks') == \
+        [(fake_hltv.DATES[-2],)]
+
+    # once it is published, the next enqueue queues it again
+    hltv_stats(postgres, database, 'enqueue')
+    run_workers(postgres, database, WORKERS)
+
+    assert query(postgres, database,
+                 'SELECT COUNT(*) FROM ranks WHERE date = \'%s\''
+                 % (last.isoformat(),)) == [(30,)]
+    assert query(postgres, database,
+                 'SELECT COUNT(*) FROM work_queue WHERE NOT done') == [(0,)]
+
+
+def test_lease_skips_locked_items(postgres, database):
+    conn = postgres.connect(database)
+    cur = conn.cursor()
+    work_queue.create_tables(cur)
+    for key in ('a', 'b'):
+        work_queue.enqueue(cur, 'date', key)
+    conn.commit()
+
+    other = postgres.connect(database)
+    other_cur = other.cursor()
+
+    # the first lease is not committed yet, so its row is still locked
+    first = work_queue.lease(cur, 'one', 60)
+    second = work_queue.lease(other_cur, 'two', 60)
+
+    assert first[1] != second[1]
+    assert work_queue.lease(other_cur, 'two', 60) is None
+
+    conn.close()
+    other.close()
+
+
+def test_expired_lease_cannot_complete(postgres, database):
+    conn = postgres.connect(database)
+    cur = conn.cursor()
+    work_queue.create_tables(cur)
+    work_queue.enqueue(cur, 'date', 'a')
+    conn.commit()
+
+    assert work_queue.lease(cur, 'one', 1) is not None
+    conn.commit()
+
+    time.sleep(1.5)
+
+    # the expired item goes to another worker
+    assert work_queue.lease(cur, 'two', 60) is not None
+    conn.commit()
+
+    assert not work_queue.complete(cur, 'date', 'a', 'one')
+    assert work_queue.complete(cur, 'date', 'a', 'two')
+    conn.commit()
+
+    assert work_queue.remaining(cur) == 0
+
+    conn.close()
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import SRC_DIR
+
+# seconds a --help invocation may take, including interpreter startup
+STARTUP_BUDGET = 0.5
+
+HEAVY_MODULES = ['bs4', 'psycopg2', 'plotly']
+
+SUBCOMMANDS = [
+    'scrape-teams', 'scrape-players', 'crawl', 'enqueue', 'work', 'changes',
+    'plot', 'export',
+]
+
+
+def run_cli(*argv):
+    start = time.perf_counter()
+    p = subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, 'hltv_stats.py')] + list(argv),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    elapsed = time.perf_counter() - start
+
+    assert p.returncode == 0, p.stderr.decode()
+    return elapsed
+
+
+def best_of(n, *argv):
+    # the fastest of a few runs, so one slow run on a busy machine does not fail
+    return min(run_cli(*argv) for i in range(n))
+
+
+def test_help_is_within_budget():
+    assert best_of(3, '--help') < STARTUP_BUDGET
+
+
+@pytest.mark.parametrize('command', SUBCOMMANDS)
+def test_subcommand_help_is_within_budget(command):
+    assert best_of(3, command, '--help') < STARTUP_BUDGET
+
+
+@pytest.mark.parametrize('command', SUBCOMMANDS)
+def test_parsing_does_not_import_subsystems(command):
+    # run in a fresh interpreter, other tests may have imported these already
+    code = (
+        'import sys\n'
+        'sys.path.insert(0, %r)\n'
+        'import hltv_stats\n'
+        'hltv_stats.build_parser().parse_args([%r])\n'
+        'print(" ".join(m for m in %r if m in sys.modules))\n'
+    ) % (SRC_DIR, command, HEAVY_MODULES)
+
+    p = subprocess.run([sys.executable, '-c', code],
+                       stdout=subprocess.PIPE, check=True)
+
+    assert p.stdout.decode().split() == []
@@ -0,0 +1,134 @@
+import io
+import os
+
+import pytest
+
+import stream_parse
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+CHUNK_SIZES = [1, 7, 64, 16384]
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def extract(page, extractor, chunk_size, monkeypatch):
+    monkeypatch.setattr(stream_parse, 'chunk_size', chunk_size)
+    return list(stream_parse.stream_records(io.BytesIO(page), extractor))
+
+
+# what scrape_teams.process_page read from the page before the extractor
+def soup_ranking(page):
+    bs4 = pytest.importorskip('bs4')
+    soup = bs4.BeautifulSoup(page, 'html.parser')
+
+    records = []
+    for team in soup.select('div.ranked-team.standard-box'):
+        records.append({
+            'name': team.find(class_='name').text,
+            'rank': int(team.find(class_='position').text.strip('#')),
+            'points': int(team.find(class_='points').text.strip('()').split(' ')[0]),
+            'href': team.find(
+                attrs={
+                    'data-link-tracking-destination': 'Click on HLTV Team profile [button]'
+                }
+            )['href'],
+            'logo_url': team.find(class_='team-logo').find('img')['src'],
+        })
+
+    return records
+
+
+# what scrape_players.process_team_page read from the page before the extractor
+def soup_roster(page):
+    bs4 = pytest.importorskip('bs4')
+    soup = bs4.BeautifulSoup(page, 'html.parser')
+
+    team_links = soup.find(class_='bodyshot-team')
+    return [
+        {'name': player['title'], 'href': player['href']}
+        for player in team_links.find_all('a', href=True)
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_ranking_matches_soup(chunk_size, monkeypatch):
+    page = read_fixture('ranking.html')
+
+    records = extract(page, stream_parse.RankingExtractor(), chunk_size,
+                      monkeypatch)
+
+    assert len(records) == 4
+    assert records == soup_ranking(page)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_roster_matches_soup(chunk_size, monkeypatch):
+    page = read_fixture('team.html')
+
+    records = extract(page, stream_parse.RosterExtractor(), chunk_size,
+                      monkeypatch)
+
+    assert len(records) == 5
+    assert records == soup_roster(page)
+
+
+def test_ranking_values():
+    page = read_fixture('ranking.html')
+
+    records = list(stream_parse.stream_records(
+        io.BytesIO(page), stream_parse.RankingExtractor()
+    ))
+
+    assert records[1] == {
+        'name': 'Team Liquid',
+        'rank': 2,
+        'points': 912,
+        'href': '/team/5973/liquid',
+        'logo_url': 'https://static.hltv.org/images/team/logo/5973',
+    }
+    assert records[2]['name'] == 'Natus Vincere & Friends'
+    assert records[2]['logo_url'].endswith('?ixlib=java&w=50')
+
+
+@pytest.mark.parametrize('missing', ['href', 'logo_url'])
+def test_ranking_skips_incomplete_team(missing, monkeypatch):
+    page = read_fixture('ranking.html').decode()
+
+    # break the second team only
+    start = page.index('<span class="position">#2</span>')
+    end = page.index('<span class="position">#3</span>')
+    block = page[start:end]
+    if missing == 'href':
+        block = block.replace('href="/team/5973/liquid"', '')
+        block = block.replace('href="/team/1/not-the-team"', '')
+    else:
+        block = block.replace(
+            'src="https://static.hltv.org/images/team/logo/5973"', ''
+        )
+    page = page[:start] + block + page[end:]
+
+    records = extract(page.encode(), stream_parse.RankingExtractor(), 7,
+                      monkeypatch)
+
+    assert [record['rank'] for record in records] == [1, 3, 4]
+
+
+def test_records_are_emitted_before_the_page_ends(monkeypatch):
+    monkeypatch.setattr(stream_parse, 'chunk_size', 64)
+
+    page = read_fixture('ranking.html')
+    end_of_first_team = page.index(b'<span class="position">#2</span>')
+
+    f = io.BytesIO(page)
+    records = stream_parse.stream_records(f, stream_parse.RankingExtractor())
+
+    first = next(records)
+
+    assert first['name'] == 'Astralis'
+    # only the chunks up to the end of the first team have been read
+    assert f.tell() < end_of_first_team + 64
+    assert f.tell() < len(page)